@@ -13,17 +13,40 @@ Configure the paths in the ``__main__`` block at the bottom.
 Algorithm
 ---------
 1. Read the reference raster (CRS, transform, width, height).
-2. Pre-fill a float32 output raster with nodata (-9999 by default).
+2. Create a sparse uint16 output raster (nodata 65535 by default);
+   blocks that are never written read back as nodata. If the whole
+   raster fits in memory, tiles are pasted into an in-memory mosaic
+   that is written once at the end instead.
 3. For each state tile:
-   a. Warp to the reference grid via WarpedVRT (nearest resampling).
-   b. Process block-by-block (default 512x512 pixels).
-   c. Apply scale factor 0.001 (converts int16 x100 to real LAI units).
-   d. Write valid pixels to the output (merge policy: last-one-wins).
-4. Build overview levels (2, 4, 8, 16, 32) for fast display.
+   a. Warp to the reference grid via WarpedVRT (nearest resampling);
+      tiles are processed concurrently in a thread pool, largest
+      first. For tiles already in the reference CRS, a per-row/column
+      index map replaces the warp and pixels are gathered directly.
+   b. Process block-by-block (default 1024x1024 pixels), visiting only
+      the blocks that intersect the tile's bounding box.
+   c. Keep the raw integer values and store the scale factor 0.01 in
+      the GeoTIFF scale tag, so GDAL clients read real LAI units. With
+      ``output_dtype="float32"`` the scale is applied per pixel instead.
+   d. Write valid pixels to the output (merge policy: last-one-wins,
+      in file order whatever order the workers finish in).
+4. Write a Cloud-Optimized GeoTIFF from the in-memory mosaic (or an
+   uncompressed staging GTiff); the COG driver compresses and builds
+   the overviews in the same pass. With ``driver="GTiff"`` the output
+   is written in place and overview levels (2, 4, 8, 16, 32) are built
+   afterwards.
+
+Clients that ignore the scale tag can convert a mosaic to real LAI with
+``gdal_translate -unscale -ot Float32 in.tif out.tif``.
+
+With ``engine="gdalwarp"`` step 3 is instead a single multi-source gdalwarp
+call over all tiles, with the scale factor applied in per-tile VRTs.
 
 Dependencies
 ------------
     pip install rasterio numpy tqdm
+    pip install numba            # optional: fused per-block merge kernel
+    conda install gdal           # optional: engine="gdalwarp" and
+                                 # skipping empty source blocks
 
 Reference
 ---------
@@ -32,28 +55,499 @@ index for Landsat images over the contiguous US. Remote Sensing of
 Environment, 258, 112383. https://doi.org/10.1016/j.rse.2021.112383
 """
 
+import contextlib
+import functools
+import math
+import os
+import threading
+import warnings
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 import numpy as np
 import rasterio
+import rasterio.shutil
 from rasterio.enums import Resampling
-from rasterio.windows import Window
+from rasterio.errors import NotGeoreferencedWarning
+from rasterio.transform import array_bounds
+from rasterio.windows import Window, bounds as window_bounds
 from rasterio.vrt import WarpedVRT
+from rasterio.warp import transform_bounds
 from tqdm import tqdm
 
+try:
+    import numba
+except ImportError:  # optional; falls back to NumPy masked assignment
+    numba = None
+
+try:
+    from osgeo import gdal
+except ImportError:  # optional; only needed for engine="gdalwarp"
+    gdal = None
+
+
+@functools.lru_cache(maxsize=None)
+def _merge_kernel(dtype, scale, prefer_src, nan_nodata):
+    """
+    Compile a fused merge kernel for one output ``dtype``, ``scale``,
+    merge policy and nodata kind (NaN or a finite sentinel).
+
+    The kernel ``(src, dest, dst_nodata, out)`` tests validity, scales and
+    merges a block in a single pass; ``src`` holds unscaled warped values
+    and ``out`` may alias ``dest``. The settings are closure constants, so
+    numba folds the scale into the multiply (in ``dtype``, rounding like
+    the NumPy path) and prunes the unused branches. Returns None when
+    numba is not installed.
+    """
+    if numba is None:
+        return None
+    scale = np.dtype(dtype).type(scale)
+    apply_scale = scale != 1
+
+    # fastmath without 'nnan'/'ninf' so np.isfinite is not optimised away.
+    # Not parallel=True: tiles already run in a thread pool, and prange
+    # launched from pool threads hangs numba's TBB layer at exit.
+    @numba.njit(fastmath={"nsz", "arcp", "contract", "afn", "reassoc"})
+    def kernel(src, dest, dst_nodata, out):
+        nrows, ncols = src.shape
+        for i in range(nrows):
+            for j in range(ncols):
+                v = src[i, j]
+                d = dest[i, j]
+                if nan_nodata:
+                    take = np.isfinite(v)
+                else:
+                    take = v != dst_nodata
+                if take and not prefer_src:
+                    if nan_nodata:
+                        take = not np.isfinite(d)
+                    else:
+                        take = d == dst_nodata
+                if take:
+                    if apply_scale:
+                        out[i, j] = v * scale
+                    else:
+                        out[i, j] = v
+                else:
+                    out[i, j] = d
+
+    return kernel
+
+
+def _worker_threads(num_threads, max_workers):
+    """
+    Split a GDAL thread budget (an int or 'ALL_CPUS') evenly between
+    ``max_workers`` pool workers, so concurrent tiles do not each start a
+    full set of warp and decode threads.
+    """
+    if max_workers <= 1:
+        return num_threads
+    if num_threads == "ALL_CPUS":
+        total = os.cpu_count() or 1
+    else:
+        total = int(num_threads)
+    return max(1, total // max_workers)
+
+
+def _block_extent(src, dst_crs, dst_transform, width, height, blocksize):
+    """
+    Return the block-aligned pixel extent (row0, row1, col0, col1) of the
+    output grid covered by ``src``, clamped to the grid.
+    """
+    xmin, ymin, xmax, ymax = transform_bounds(src.crs, dst_crs, *src.bounds)
+    inv = ~dst_transform
+    corners = [inv * (x, y) for x in (xmin, xmax) for y in (ymin, ymax)]
+    cols = [c for c, _ in corners]
+    rows = [r for _, r in corners]
+
+    row0 = max(0, math.floor(min(rows)) // blocksize * blocksize)
+    col0 = max(0, math.floor(min(cols)) // blocksize * blocksize)
+    row1 = min(height, math.ceil(max(rows)))
+    col1 = min(width, math.ceil(max(cols)))
+    return row0, row1, col0, col1
+
+
+@functools.lru_cache(maxsize=8)
+def _block_grid(height, width, blocksize):
+    """
+    Return the output block grid as rows of Windows (``grid[i][j]`` is
+    block row ``i``, block column ``j``), with edge blocks clipped to the
+    raster. Built once per grid and shared read-only by every tile, so
+    the per-block loop does no edge arithmetic.
+    """
+    return tuple(
+        tuple(
+            Window(col, row, min(blocksize, width - col), min(blocksize, height - row))
+            for col in range(0, width, blocksize)
+        )
+        for row in range(0, height, blocksize)
+    )
+
+
+def _source_is_empty(band, src, win, dst_transform, dst_crs):
+    """
+    Return True if the part of ``src`` under output window ``win`` is known
+    to hold no data, using GDAL's data coverage status on the source band
+    (a metadata lookup for sparse/tiled GTiffs). Unknown coverage and
+    partial coverage both return False.
+    """
+    xmin, ymin, xmax, ymax = transform_bounds(
+        dst_crs, src.crs, *window_bounds(win, dst_transform)
+    )
+    inv = ~src.transform
+    corners = [inv * (x, y) for x in (xmin, xmax) for y in (ymin, ymax)]
+    # Pad by one pixel so nearest-neighbour samples on the edge count
+    col0 = max(0, math.floor(min(c for c, _ in corners)) - 1)
+    row0 = max(0, math.floor(min(r for _, r in corners)) - 1)
+    col1 = min(src.width, math.ceil(max(c for c, _ in corners)) + 1)
+    row1 = min(src.height, math.ceil(max(r for _, r in corners)) + 1)
+    if col0 >= col1 or row0 >= row1:
+        return True
+
+    flags, _ = band.GetDataCoverageStatus(col0, row0, col1 - col0, row1 - row0)
+    return flags == gdal.GDAL_DATA_COVERAGE_STATUS_EMPTY
+
+
+def _nearest_index_map(src, dst_crs, dst_transform, width, height, resampling):
+    """
+    Return ``(row_idx, col_idx)``: for every output row/column, the source
+    row/column that nearest-neighbour warping samples (-1 = outside the
+    source). Only defined for nearest resampling between north-up grids in
+    the same CRS, where the mapping is separable; returns None otherwise.
+    """
+    src_t = src.transform
+    if (
+        resampling != Resampling.nearest
+        or src.crs != dst_crs
+        or src_t.b or src_t.d or dst_transform.b or dst_transform.d
+    ):
+        return None
+
+    # Sample at output pixel centres, as GDAL's nearest warper does
+    xs = dst_transform.c + (np.arange(width) + 0.5) * dst_transform.a
+    ys = dst_transform.f + (np.arange(height) + 0.5) * dst_transform.e
+    col_idx = np.floor((xs - src_t.c) / src_t.a).astype(np.int64)
+    row_idx = np.floor((ys - src_t.f) / src_t.e).astype(np.int64)
+    col_idx[(col_idx < 0) | (col_idx >= src.width)] = -1
+    row_idx[(row_idx < 0) | (row_idx >= src.height)] = -1
+    return row_idx, col_idx
+
+
+def _gather_block(src, row_idx, col_idx, out, dst_nodata):
+    """
+    Fill ``out`` with the source pixels selected by ``row_idx``/``col_idx``
+    (from ``_nearest_index_map``), mapping source nodata and pixels outside
+    the source to ``dst_nodata``. Returns False if the block misses the
+    source entirely.
+    """
+    rows = np.flatnonzero(row_idx >= 0)
+    cols = np.flatnonzero(col_idx >= 0)
+    if not rows.size or not cols.size:
+        return False
+
+    # Indices are monotonic, so the covered part of the block is a rectangle
+    r = row_idx[rows]
+    c = col_idx[cols]
+    r0, c0 = min(r[0], r[-1]), min(c[0], c[-1])
+    r1, c1 = max(r[0], r[-1]) + 1, max(c[0], c[-1]) + 1
+    raw = src.read(1, window=Window(c0, r0, c1 - c0, r1 - r0))
+    vals = raw[np.ix_(r - r0, c - c0)]
+
+    out.fill(dst_nodata)
+    covered = out[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+    covered[...] = vals
+    if src.nodata is not None:
+        if np.isnan(src.nodata):
+            covered[np.isnan(vals)] = dst_nodata
+        else:
+            covered[vals == src.nodata] = dst_nodata
+    return True
+
+
+def warp_state_to_arrays(
+    tif,
+    dst_crs,
+    dst_transform,
+    width,
+    height,
+    blocksize=1024,
+    resampling=Resampling.nearest,
+    dst_nodata=-9999.0,
+    dtype="float32",
+    num_threads="ALL_CPUS",
+    warp_mem_limit=512,
+):
+    """
+    Warp one state tile onto the reference grid block by block.
+
+    Yields ``(window, array)`` pairs for every output block that intersects
+    the tile's bounding box. Each call opens its own dataset and WarpedVRT,
+    so separate calls may run concurrently in different threads. The
+    yielded array is a view into a buffer reused for every block; consume
+    it before advancing the iterator. When ``osgeo`` is available and the
+    source has a nodata value, blocks whose source region GDAL reports as
+    empty (missing from a sparse GTiff) are skipped without warping.
+
+    For nearest resampling between grids in the same CRS, the source pixel
+    feeding each output row and column is computed up front (see
+    ``_nearest_index_map``) and blocks are gathered directly from the
+    source instead of going through the warper.
+    """
+    src_buf = np.empty((blocksize, blocksize), dtype=dtype)
+    with rasterio.open(str(tif)) as src:
+        row0, row1, col0, col1 = _block_extent(
+            src, dst_crs, dst_transform, width, height, blocksize
+        )
+        if row0 >= row1 or col0 >= col1:
+            return
+        # Missing blocks read back as nodata only if the source has one;
+        # otherwise they are zeros, which count as valid. One query over
+        # the whole source (a WarpedVRT does not implement coverage) tells
+        # whether per-block queries can find anything to skip.
+        coverage_band = None
+        if gdal is not None and src.nodata is not None:
+            gdal_src = gdal.Open(str(tif))
+            band = gdal_src.GetRasterBand(1)
+            flags, _ = band.GetDataCoverageStatus(0, 0, src.width, src.height)
+            if flags & gdal.GDAL_DATA_COVERAGE_STATUS_EMPTY:
+                coverage_band = band
+        index_map = _nearest_index_map(
+            src, dst_crs, dst_transform, width, height, resampling
+        )
+        # Float sources can hold NaN that is not their declared nodata;
+        # map it to dst_nodata too, so every yielded value is finite or
+        # dst_nodata.
+        remap_nan = (
+            np.dtype(src.dtypes[0]).kind == "f"
+            and np.dtype(dtype).kind == "f"
+            and np.isfinite(dst_nodata)
+            and not (src.nodata is not None and np.isnan(src.nodata))
+        )
+        with contextlib.ExitStack() as stack:
+            if index_map is None:
+                vrt = stack.enter_context(WarpedVRT(
+                    src,
+                    crs=dst_crs,
+                    transform=dst_transform,
+                    width=width,
+                    height=height,
+                    resampling=resampling,
+                    src_nodata=src.nodata,
+                    nodata=dst_nodata,
+                    dtype=dtype,
+                    warp_mem_limit=warp_mem_limit,
+                    num_threads=num_threads,
+                ))
+            grid = _block_grid(height, width, blocksize)
+            for grid_row in grid[row0 // blocksize:-(-row1 // blocksize)]:
+                for win in grid_row[col0 // blocksize:-(-col1 // blocksize)]:
+                    h, w = win.height, win.width
+                    if coverage_band is not None and _source_is_empty(
+                        coverage_band, src, win, dst_transform, dst_crs
+                    ):
+                        continue
+                    out = src_buf[:h, :w]
+                    if index_map is None:
+                        vrt.read(1, window=win, out=out)
+                    elif not _gather_block(
+                        src,
+                        index_map[0][win.row_off:win.row_off + h],
+                        index_map[1][win.col_off:win.col_off + w],
+                        out,
+                        dst_nodata,
+                    ):
+                        continue
+                    if remap_nan:
+                        out[np.isnan(out)] = dst_nodata
+                    yield win, out
+
+
+def _scale_vrt(vrt_path, scale, dtype):
+    """
+    Rewrite a gdalbuildvrt VRT so each source is multiplied by ``scale``
+    on read. Source nodata pixels are skipped by the ComplexSource and keep
+    the band's nodata value.
+    """
+    tree = ET.parse(vrt_path)
+    for band in tree.getroot().iter("VRTRasterBand"):
+        band.set("dataType", gdal.GetDataTypeName(gdal.GetDataTypeByName(dtype)))
+        for src in list(band):
+            if src.tag not in ("SimpleSource", "ComplexSource"):
+                continue
+            src.tag = "ComplexSource"
+            ET.SubElement(src, "ScaleOffset").text = "0"
+            # Round the ratio to ``dtype`` first: GDAL scales in double, and
+            # the exact product then rounds like the python engine's
+            ET.SubElement(src, "ScaleRatio").text = repr(
+                float(np.dtype(dtype).type(scale))
+            )
+    tree.write(vrt_path)
+
+
+def _merge_with_gdalwarp(tifs, out_tif, profile, gdal_env, resampling, scale):
+    """
+    Warp ``tifs`` onto the grid described by ``profile`` in a single
+    multi-source gdalwarp call. Each tile is resampled once, straight onto
+    the output grid, and later tiles win where tiles overlap, matching
+    ``prefer='src'``. With a scale, every tile is read through its own
+    single-source VRT, which keeps the tile's native grid.
+    """
+    if gdal is None:
+        raise ImportError("engine='gdalwarp' requires the GDAL Python bindings (osgeo)")
+
+    core = {"driver", "width", "height", "count", "dtype", "crs", "transform", "nodata"}
+    creation_options = [
+        f"{k.upper()}={'YES' if v is True else v}"
+        for k, v in profile.items() if k not in core
+    ]
+    num_threads = profile.get("NUM_THREADS", "ALL_CPUS")
+
+    sources = [str(t) for t in tifs]
+    vrt_paths = []
+    saved = {k: gdal.GetConfigOption(k) for k in gdal_env}
+    # Exceptions are a process-wide osgeo setting; restore the caller's mode
+    used_exceptions = gdal.GetUseExceptions()
+    gdal.UseExceptions()
+    try:
+        for k, v in gdal_env.items():
+            gdal.SetConfigOption(k, str(v))
+
+        if scale != 1.0:
+            for i, tif in enumerate(tifs):
+                vrt_path = out_tif.with_name(f"{out_tif.stem}.src{i}.vrt")
+                vrt_paths.append(vrt_path)
+                gdal.BuildVRT(str(vrt_path), [str(tif)])
+                _scale_vrt(vrt_path, scale, profile["dtype"])
+            sources = [str(v) for v in vrt_paths]
+
+        gdal.Warp(
+            str(out_tif),
+            sources,
+            format=profile["driver"],
+            dstSRS=profile["crs"].to_wkt(),
+            outputBounds=array_bounds(
+                profile["height"], profile["width"], profile["transform"]
+            ),
+            width=profile["width"],
+            height=profile["height"],
+            resampleAlg=resampling.name,
+            dstNodata=profile["nodata"],
+            outputType=gdal.GetDataTypeByName(profile["dtype"]),
+            multithread=True,
+            warpOptions=[f"NUM_THREADS={num_threads}"],
+            creationOptions=creation_options,
+        )
+    finally:
+        for k, v in saved.items():
+            gdal.SetConfigOption(k, v)
+        if not used_exceptions:
+            gdal.DontUseExceptions()
+        for vrt_path in vrt_paths:
+            vrt_path.unlink(missing_ok=True)
+
+
+def _set_scale_tag(dst, scale):
+    """Record ``scale`` in the band's scale/offset tags for unscaling on read."""
+    dst.scales = (scale,)
+    dst.offsets = (0.0,)
+
+
+def _build_overviews(dst, profile, num_threads="ALL_CPUS"):
+    """
+    Build overview levels (2 .. 32) for fast display, multithreaded and
+    compressed like the full-resolution data in ``profile``.
+    """
+    ovr_env = {
+        "GDAL_NUM_THREADS": num_threads,
+        "COMPRESS_OVERVIEW": profile["compress"],
+        "PREDICTOR_OVERVIEW": profile["predictor"],
+        "BIGTIFF_OVERVIEW": profile["BIGTIFF"],
+        "GDAL_TIFF_OVR_BLOCKSIZE": 512,
+    }
+    if "zstd_level" in profile:
+        ovr_env["ZSTD_LEVEL_OVERVIEW"] = profile["zstd_level"]
+    try:
+        with rasterio.Env(**ovr_env):
+            dst.build_overviews([2, 4, 8, 16, 32], Resampling.average)
+        dst.update_tags(ns="rio_overview", resampling="average")
+    except Exception as e:
+        print(f"Overview build skipped: {e}")
+
+
+# GDAL names of the output dtypes, for MEM dataset open strings
+_GDAL_TYPE_NAMES = {"uint16": "UInt16", "float32": "Float32"}
+
+
+@contextlib.contextmanager
+def _mem_dataset(arr, profile):
+    """
+    Open a GDAL MEM dataset over the 2-D array ``arr`` without copying it,
+    georeferenced as ``profile``. ``arr`` must stay alive (and must not be
+    reallocated) while the dataset is open.
+    """
+    name = (
+        f"MEM:::DATAPOINTER={arr.ctypes.data},"
+        f"PIXELS={arr.shape[1]},LINES={arr.shape[0]},BANDS=1,"
+        f"DATATYPE={_GDAL_TYPE_NAMES[arr.dtype.name]},"
+        f"PIXELOFFSET={arr.strides[1]},LINEOFFSET={arr.strides[0]}"
+    )
+    # GDAL >= 3.10 refuses DATAPOINTER opens unless explicitly enabled
+    with rasterio.Env(GDAL_MEM_ENABLE_OPEN="YES"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", NotGeoreferencedWarning)
+        dst = rasterio.open(name, "r+")
+    with dst:
+        dst.crs = profile["crs"]
+        dst.transform = profile["transform"]
+        dst.nodata = profile["nodata"]
+        yield dst
+
+
+def _write_cog(src, out_tif, profile, gdal_env, num_threads="ALL_CPUS"):
+    """
+    Copy the mosaic ``src`` (a staging GTiff path or an open dataset) to a
+    Cloud-Optimized GeoTIFF with the COG driver, which compresses, builds
+    overviews and lays out IFDs in the same pass.
+    """
+    cog_options = {
+        "driver": "COG",
+        "compress": profile["compress"],
+        "predictor": "YES",
+        "blocksize": profile["blockxsize"],
+        "bigtiff": profile["BIGTIFF"],
+        "overviews": "AUTO",
+        "overview_resampling": "AVERAGE",
+        "num_threads": num_threads,
+        "sparse_ok": "TRUE",
+    }
+    if "zstd_level" in profile:
+        cog_options["level"] = profile["zstd_level"]
+    if isinstance(src, Path):
+        src = str(src)
+    with rasterio.Env(**gdal_env):
+        rasterio.shutil.copy(src, str(out_tif), **cog_options)
+
 
 def merge_continuous_to_ref_grid(
     in_dir,
     ref_tif,
     out_tif,
     recursive=True,
-    blocksize=512,
+    blocksize=1024,
     prefer="src",
     dst_nodata=None,
     src_valid_fn=None,
     resampling=Resampling.nearest,
-    compress="LZW",
+    compress="ZSTD",
     bigtiff="IF_SAFER",
-    scale_factor=0.001,
+    scale_factor=0.01,
+    zstd_level=1,
+    max_workers=None,
+    num_threads="ALL_CPUS",
+    engine="python",
+    output_dtype="uint16",
+    mosaic_mem_limit=4096,
+    overview_threads=None,
+    driver="COG",
 ):
     """
     Merge continuous rasters (e.g., LAI) onto the exact grid of ref_tif.
@@ -70,25 +564,89 @@ def merge_continuous_to_ref_grid(
     recursive : bool
         Whether to search subdirectories for .tif files.
     blocksize : int
-        Tile size (pixels) for block-by-block processing.
+        Tile size (pixels) for block-by-block processing; also the
+        output TIFF tile size, so must be a multiple of 16
+        (default: 1024).
     prefer : str
         Merge policy: ``'src'`` = last-one-wins (overwrites);
         ``'dest'`` = first-one-wins (fills gaps only).
     dst_nodata : float or None
-        Output nodata value. Defaults to ref raster nodata or -9999.
+        Output nodata value. Defaults to 65535 for uint16 output, or to
+        the ref raster nodata or -9999 for float32 output. Must be an
+        integer in 0..65535 for uint16 output.
     src_valid_fn : callable or None
         Function(array, nodata) -> bool mask defining valid pixels.
-        Defaults to: finite and != nodata.
+        Defaults to: != nodata (NaN from float sources is mapped to
+        nodata when warped), or finite when nodata is NaN.
     resampling : rasterio.enums.Resampling
         Resampling method for warping (default: nearest).
     compress : str
-        GDAL compression codec (default: 'LZW').
+        GDAL compression codec (default: 'ZSTD'; 'LZW' also works).
     bigtiff : str
         BigTIFF mode (default: 'IF_SAFER').
     scale_factor : float
-        Multiply valid source pixels by this value before writing.
-        Use 0.001 to convert LAI stored as int16 x100 to real units.
+        Real LAI = stored value x this factor. Written to the scale tag
+        for uint16 output; multiplied into valid pixels for float32.
+        Default 0.01: the GEE export stores LAI x100 as uint16.
+    zstd_level : int
+        ZSTD compression level (default: 1, fastest). Ignored for
+        other codecs.
+    max_workers : int or None
+        Number of state tiles warped concurrently (default: CPU count).
+        With more than one worker, tiles are dispatched largest-first;
+        pixels covered by several tiles are still resolved in file order,
+        so the result does not depend on the number of workers.
+    num_threads : int or str
+        GDAL worker threads for warping and compression
+        (default: 'ALL_CPUS'). With several ``max_workers`` this budget
+        is split between them for warping and source decoding. Parallel
+        I/O can be slower on spinning disks; pass 1 there.
+    engine : str
+        ``'python'`` merges block by block in this module;
+        ``'gdalwarp'`` warps all tiles in one multithreaded, multi-source
+        gdalwarp call (needs ``osgeo``; supports only ``prefer='src'``
+        with the default validity test).
+    output_dtype : str
+        ``'uint16'`` (default) writes the raw integer source values and
+        records ``scale_factor`` in the GeoTIFF scale tag, so GDAL
+        clients unscale on read; half the size of float32 and no
+        per-pixel float work. ``'float32'`` writes real LAI
+        (source x ``scale_factor``).
+    mosaic_mem_limit : int
+        If the full output raster fits in this many MB, build the mosaic
+        in memory and write it once at the end instead of re-reading and
+        re-encoding output blocks for every tile (default: 4096; 0
+        disables). A full CONUS 30 m grid needs far more than this and
+        stays on disk.
+    overview_threads : int, str or None
+        GDAL threads for building overviews (default: ``num_threads``).
+        Lower this on spinning disks, where many threads can be slower.
+    driver : str
+        ``'COG'`` (default) hands the mosaic to GDAL's COG driver, which
+        compresses it and builds overviews in one pass; a mosaic merged
+        on disk is staged in an uncompressed temporary GTiff first.
+        ``'GTiff'`` writes ``out_tif`` directly and builds overviews in
+        place.
     """
+    if prefer not in ("src", "dest"):
+        raise ValueError("prefer must be 'src' or 'dest'")
+    if blocksize % 16:
+        raise ValueError("blocksize must be a multiple of 16 (GTiff tiling)")
+    if output_dtype not in ("float32", "uint16"):
+        raise ValueError("output_dtype must be 'float32' or 'uint16'")
+    if output_dtype == "uint16" and dst_nodata is not None and not (
+        float(dst_nodata).is_integer() and 0 <= dst_nodata <= 65535
+    ):
+        raise ValueError("dst_nodata must be an integer in 0..65535 "
+                         "for output_dtype='uint16'")
+    if driver not in ("COG", "GTiff"):
+        raise ValueError("driver must be 'COG' or 'GTiff'")
+    if engine not in ("python", "gdalwarp"):
+        raise ValueError("engine must be 'python' or 'gdalwarp'")
+    if engine == "gdalwarp" and (prefer != "src" or src_valid_fn is not None):
+        raise ValueError("engine='gdalwarp' supports only prefer='src' "
+                         "with the default src_valid_fn")
+
     in_dir = Path(in_dir)
     tifs = sorted(in_dir.rglob("*.tif") if recursive else in_dir.glob("*.tif"))
     tifs += sorted(in_dir.rglob("*.tiff") if recursive else in_dir.glob("*.tiff"))
@@ -101,10 +659,14 @@ def merge_continuous_to_ref_grid(
         dst_transform = ref.transform
         width, height = ref.width, ref.height
         ref_nodata    = ref.nodata
-        out_dtype     = "float32"
+        out_dtype     = output_dtype
 
+    integer_out = out_dtype == "uint16"
     if dst_nodata is None:
-        dst_nodata = ref_nodata if ref_nodata is not None else -9999.0
+        if integer_out:
+            dst_nodata = 65535
+        else:
+            dst_nodata = ref_nodata if ref_nodata is not None else -9999.0
 
     profile = {
         "driver":    "GTiff",
@@ -120,81 +682,290 @@ def merge_continuous_to_ref_grid(
         "blockysize": blocksize,
         "compress":  compress,
         "BIGTIFF":   bigtiff,
-        "predictor": 2,
+        "predictor": 2 if integer_out else 3,
+        "SPARSE_OK": "TRUE",
+        "NUM_THREADS": num_threads,
     }
+    if compress.upper() == "ZSTD":
+        profile["zstd_level"] = zstd_level
+
+    if overview_threads is None:
+        overview_threads = num_threads
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
 
+    # rasterio.Env options are per-thread, so every worker enters its own,
+    # with its share of the thread budget. Output writes are serialised by
+    # the write lock, so compression keeps the full budget.
+    gdal_env = {
+        "GDAL_NUM_THREADS": num_threads,
+        "GDAL_CACHEMAX": 4096,
+        "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+    }
+    worker_threads = _worker_threads(num_threads, max_workers)
+    worker_env = {**gdal_env, "GDAL_NUM_THREADS": worker_threads}
+
+    scale = 1.0 if scale_factor is None else float(scale_factor)
+    # Integer output keeps raw values; the scale goes in the GeoTIFF tag
+    tag_scale = scale
+    if integer_out:
+        scale = 1.0
+
+    # The fused kernel hard-codes the default validity test. It is
+    # compiled once per (dtype, scale, prefer, nodata kind), not per block.
+    kernel = None
     if src_valid_fn is None:
-        def src_valid_fn(arr, nodata_val):
-            if nodata_val is None:
-                return np.isfinite(arr)
-            return np.isfinite(arr) & (arr != nodata_val)
+        kernel = _merge_kernel(
+            out_dtype, scale, prefer == "src", not np.isfinite(dst_nodata)
+        )
+    use_kernel = kernel is not None
+
+    # Specialise the validity test once, outside the block loop.
+    # warp_state_to_arrays maps source nodata and any NaN to dst_nodata,
+    # so a finite nodata needs a single compare, written into a reusable
+    # mask buffer.
+    if src_valid_fn is not None:
+        def is_valid(arr, out, fn=src_valid_fn, nd=dst_nodata):
+            return fn(arr, nd)
+    elif dst_nodata is None or not np.isfinite(dst_nodata):
+        def is_valid(arr, out):
+            return np.isfinite(arr, out=out)
+    else:
+        def is_valid(arr, out, nd=np.dtype(out_dtype).type(dst_nodata)):
+            return np.not_equal(arr, nd, out=out)
 
     out_tif = Path(out_tif)
     out_tif.parent.mkdir(parents=True, exist_ok=True)
+    # The COG driver is copy-only, so merge into a GTiff first. It is left
+    # uncompressed: the COG copy encodes every block anyway.
+    if driver == "COG":
+        staging_tif = out_tif.with_name(out_tif.stem + ".staging.tif")
+        staging_profile = {
+            k: v for k, v in profile.items() if k not in ("predictor", "zstd_level")
+        }
+        staging_profile["compress"] = "NONE"
+    else:
+        staging_tif = out_tif
+        staging_profile = profile
+
+    def finalize(dst):
+        """Tag the staged mosaic and, for GTiff output, add overviews."""
+        if integer_out:
+            _set_scale_tag(dst, tag_scale)
+        if driver == "GTiff":
+            _build_overviews(dst, profile, overview_threads)
+
+    if engine == "gdalwarp":
+        _merge_with_gdalwarp(
+            tifs, staging_tif, staging_profile, gdal_env, resampling, scale
+        )
+        with rasterio.Env(**gdal_env), rasterio.open(staging_tif, "r+") as dst:
+            finalize(dst)
+        if driver == "COG":
+            _write_cog(staging_tif, out_tif, profile, gdal_env, overview_threads)
+            staging_tif.unlink()
+        print(f"Done. Wrote: {out_tif}")
+        return
+
+    # Paste tiles into an in-memory mosaic when it fits; otherwise merge
+    # into the output file block by block.
+    mosaic_mb = height * width * np.dtype(out_dtype).itemsize / 2**20
+    if mosaic_mb <= mosaic_mem_limit:
+        mosaic = np.full((height, width), dst_nodata, dtype=out_dtype)
+    else:
+        mosaic = None
+
+    write_lock = threading.Lock()
+    # Only touched while holding write_lock, so one buffer is enough
+    dest_buf = np.empty((blocksize, blocksize), dtype=out_dtype)
+    dest_mask_buf = np.empty((blocksize, blocksize), dtype=bool)
+
+    # Output blocks touched by more than one tile (with the number of those
+    # tiles still running), and which tile (1-based file-order rank) wrote
+    # each: one rank while a single tile has written the block, a
+    # per-pixel rank array once a second one does. Filled in below when
+    # tiles run concurrently.
+    tile_blocks = {}
+    shared_blocks = {}
+    block_ranks = {}
+    rank_dtype = np.min_scalar_type(len(tifs))
+
+    def merge_tile(tif, rank):
+        """Warp one state tile and merge its blocks into the output."""
+        src_mask_buf = np.empty((blocksize, blocksize), dtype=bool)
+        with rasterio.Env(**worker_env):
+            for win, src_block in warp_state_to_arrays(
+                tif, dst_crs, dst_transform, width, height,
+                blocksize=blocksize,
+                resampling=resampling,
+                dst_nodata=dst_nodata,
+                dtype=out_dtype,
+                num_threads=worker_threads,
+            ):
+                h, w = src_block.shape
+                src_valid = is_valid(src_block, src_mask_buf[:h, :w])
+
+                # Window lies outside this tile's footprint
+                if not src_valid.any():
+                    continue
+
+                key = (win.row_off, win.col_off)
+                src_all = src_valid.all()
+                full = prefer == "src" and src_all
+
+                # Scale from uint16 x100 to real LAI. The whole block is
+                # scaled in place; nodata pixels are masked out below, and
+                # src_valid was taken from the unscaled values. The fused
+                # kernel scales on its own.
+                scaled = (full or not use_kernel) and scale != 1.0
+                if scaled:
+                    src_block *= scale
+
+                # The read-merge-write below must be atomic: neighbouring
+                # tiles share blocks along state borders. This also keeps
+                # numba's (non-thread-safe) workqueue layer single-caller.
+                with write_lock:
+                    # Tiles finish in any order, so a block another tile
+                    # has already written is merged by file-order rank:
+                    # later tiles win under 'src', earlier ones under
+                    # 'dest'. The first writer takes the usual paths.
+                    owner = block_ranks.get(key, 0) if key in shared_blocks else 0
+                    ranked = isinstance(owner, np.ndarray) or owner > 0
+                    if isinstance(owner, np.ndarray):
+                        full = False
+                    elif ranked:
+                        # Beating the only writer with a fully covered
+                        # block overwrites it everywhere
+                        wins = rank > owner if prefer == "src" else rank < owner
+                        full = wins and src_all
+                        ranked = not full
+                    if key in shared_blocks and not ranked:
+                        block_ranks[key] = rank
+                    if (full or ranked) and not scaled and scale != 1.0:
+                        src_block *= scale
 
-    # Step 1: Create output raster pre-filled with nodata
-    with rasterio.open(out_tif, "w", **profile) as dst_w:
-        blank = np.full((1, blocksize, blocksize), dst_nodata, dtype=out_dtype)
-        for row in range(0, height, blocksize):
-            h = min(blocksize, height - row)
-            for col in range(0, width, blocksize):
-                w = min(blocksize, width - col)
-                dst_w.write(blank[:, :h, :w], window=Window(col, row, w, h))
-
-    # Step 2: Warp and merge each state tile
-    with rasterio.open(out_tif, "r+") as dst:
-        for tif in tqdm(tifs, desc="Merging LAI tiles"):
+                    # Fully covered window that wins every pixel:
+                    # nothing in dest survives, so skip the read.
+                    if full:
+                        if mosaic is not None:
+                            mosaic[win.toslices()] = src_block
+                        else:
+                            dst.write(src_block, indexes=1, window=win)
+                        continue
+
+                    # Merge into the dest block in place: a view of the
+                    # mosaic, or the dest buffer read from disk.
+                    if mosaic is not None:
+                        dest_block = mosaic[win.toslices()]
+                    else:
+                        dest_block = dst.read(
+                            1, window=win,
+                            out=dest_buf[:h, :w],
+                        )
+                    if ranked:
+                        rank_block = owner
+                        if not isinstance(rank_block, np.ndarray):
+                            # Second writer: every valid dest pixel so far
+                            # came from the block's only writer
+                            dest_valid = is_valid(dest_block, dest_mask_buf[:h, :w])
+                            rank_block = block_ranks[key] = np.where(
+                                dest_valid, owner, 0
+                            ).astype(rank_dtype)
+                        if prefer == "src":
+                            take = src_valid & (rank_block < rank)
+                        else:
+                            take = src_valid & (
+                                (rank_block == 0) | (rank_block > rank)
+                            )
+                        dest_block[take] = src_block[take]
+                        rank_block[take] = rank
+                    elif use_kernel:
+                        kernel(
+                            src_block, dest_block,
+                            dest_block.dtype.type(dst_nodata), dest_block,
+                        )
+                    elif prefer == "src":
+                        dest_block[src_valid] = src_block[src_valid]
+                    else:
+                        dest_valid = is_valid(dest_block, dest_mask_buf[:h, :w])
+                        fill = (~dest_valid) & src_valid
+                        dest_block[fill] = src_block[fill]
+
+                    if mosaic is None:
+                        dst.write(dest_block, indexes=1, window=win)
+
+        # Free the rank records of shared blocks no other tile still needs
+        with write_lock:
+            for key in tile_blocks.get(tif, ()):
+                if key in shared_blocks:
+                    shared_blocks[key] -= 1
+                    if not shared_blocks[key]:
+                        block_ranks.pop(key, None)
+
+    ranks = {tif: i for i, tif in enumerate(tifs, 1)}
+
+    # Largest-first (LPT) dispatch so a big state does not start last and
+    # stall the pool. Only metadata is read; tiles off the grid are dropped.
+    # The same extents tell which output blocks several tiles compete for.
+    if max_workers > 1:
+        work = {}
+        for tif in tifs:
             with rasterio.open(str(tif)) as src:
-                src_nodata = src.nodata
-                with WarpedVRT(
-                    src,
-                    crs=dst_crs,
-                    transform=dst_transform,
-                    width=width,
-                    height=height,
-                    resampling=resampling,
-                    src_nodata=src_nodata,
-                    nodata=dst_nodata,
-                    dtype=out_dtype,
-                ) as vrt:
+                row0, row1, col0, col1 = _block_extent(
+                    src, dst_crs, dst_transform, width, height, blocksize
+                )
+            work[tif] = max(0, row1 - row0) * max(0, col1 - col0)
+            tile_blocks[tif] = [
+                (row, col)
+                for row in range(row0, row1, blocksize)
+                for col in range(col0, col1, blocksize)
+            ]
+            for key in tile_blocks[tif]:
+                shared_blocks[key] = shared_blocks.get(key, 0) + 1
+        for key in [k for k, n in shared_blocks.items() if n == 1]:
+            del shared_blocks[key]
+        tifs = sorted((t for t in tifs if work[t]), key=work.get, reverse=True)
+
+    def merge_all():
+        """Warp and merge all state tiles in the thread pool."""
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(merge_tile, tif, ranks[tif]) for tif in tifs]
+            for fut in tqdm(
+                as_completed(futures), total=len(futures), desc="Merging LAI tiles"
+            ):
+                fut.result()
+
+    with rasterio.Env(**gdal_env):
+        if mosaic is None:
+            # Merge straight into the output (or staging) file. It is
+            # created sparse, so blocks no tile touches are never written
+            # and read back as nodata.
+            with rasterio.open(staging_tif, "w+", **staging_profile) as dst:
+                merge_all()
+                finalize(dst)
+            if driver == "COG":
+                _write_cog(staging_tif, out_tif, profile, gdal_env, overview_threads)
+                staging_tif.unlink()
+        else:
+            merge_all()
+            if driver == "COG":
+                # Hand the mosaic to the COG driver from memory, wrapped
+                # rather than copied; no staging file is written or re-read.
+                with _mem_dataset(mosaic, profile) as dst:
+                    finalize(dst)
+                    _write_cog(dst, out_tif, profile, gdal_env, overview_threads)
+            else:
+                # Single pass over the in-memory mosaic; all-nodata blocks
+                # are left out of the sparse file.
+                with rasterio.open(out_tif, "w", **profile) as dst:
                     for row in range(0, height, blocksize):
                         h = min(blocksize, height - row)
-                        for col in range(0, width, blocksize):
-                            w = min(blocksize, width - col)
-                            win = Window(col, row, w, h)
-
-                            dest_block = dst.read(1, window=win)
-                            src_block  = vrt.read(1, window=win)
-
-                            dest_valid = src_valid_fn(dest_block, dst_nodata)
-                            src_valid  = src_valid_fn(src_block,  dst_nodata)
-
-                            # Scale valid pixels from int16 x1000 to real LAI
-                            if scale_factor is not None and scale_factor != 1.0:
-                                src_block_scaled = src_block.astype("float32", copy=False)
-                                src_block_scaled[src_valid] = (
-                                    src_block_scaled[src_valid] * scale_factor
-                                )
-                            else:
-                                src_block_scaled = src_block
-
-                            out_block = dest_block.copy()
-                            if prefer == "src":
-                                out_block[src_valid] = src_block_scaled[src_valid]
-                            elif prefer == "dest":
-                                fill = (~dest_valid) & src_valid
-                                out_block[fill] = src_block_scaled[fill]
-                            else:
-                                raise ValueError("prefer must be 'src' or 'dest'")
-
-                            dst.write(out_block[np.newaxis, :, :], window=win)
-
-        # Build overviews for fast display
-        try:
-            dst.build_overviews([2, 4, 8, 16, 32], Resampling.average)
-            dst.update_tags(ns="rio_overview", resampling="average")
-        except Exception as e:
-            print(f"Overview build skipped: {e}")
+                        dst.write(
+                            mosaic[row:row + h], indexes=1,
+                            window=Window(0, row, width, h),
+                        )
+                    finalize(dst)
 
     print(f"Done. Wrote: {out_tif}")
 
@@ -226,12 +997,13 @@ if __name__ == "__main__":
             ref_tif=ref_tif,
             out_tif=out_tif,
             recursive=True,
-            blocksize=512,
+            blocksize=1024,
             prefer="src",
             dst_nodata=None,
             src_valid_fn=None,
             resampling=Resampling.nearest,
-            compress="LZW",
+            compress="ZSTD",
             bigtiff="IF_SAFER",
-            scale_factor=0.001,
+            scale_factor=0.01,
+            output_dtype="uint16",
         )